@@ -2,16 +2,21 @@
 
 from __future__ import annotations
 
-import datetime
-import io
+import asyncio
+import concurrent.futures
+import functools
 import logging
-import wave
+import math
+import struct
+import time
+import uuid
 from collections.abc import AsyncIterable
 
+import aiohttp
 import async_timeout
 import homeassistant.helpers.config_validation as cv
 import netifaces
-import requests
+import numpy as np
 import voluptuous as vol
 from homeassistant.components.stt import (
     AudioBitRates,
@@ -24,13 +29,16 @@ from homeassistant.components.stt import (
     SpeechResult,
     SpeechResultState,
 )
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
 from pydub import AudioSegment
-from pydub.silence import detect_nonsilent
 
 _LOGGER = logging.getLogger(__name__)
 
 CONF_API_KEY = "api_key"
 
+# 전체 음성의 평균 레벨이 이 값보다 낮으면 무음으로 보고 바로 종료
+SILENCE_THRESH = -70
+
 SUPPORTED_LANGUAGES = [
     "en-US",
     "ko-KR",
@@ -43,6 +51,39 @@ PLATFORM_SCHEMA = cv.PLATFORM_SCHEMA.extend(
 )
 
 
+@functools.lru_cache(maxsize=1)
+def _get_mac():
+    """Return the MAC address of this host, looked up once."""
+    try:
+        return netifaces.ifaddresses("end0")[netifaces.AF_LINK][0]["addr"]
+    except (ValueError, KeyError, IndexError):
+        _LOGGER.warning("Interface end0 not found, falling back to uuid.getnode()")
+        node = uuid.getnode()
+        return ":".join(f"{(node >> shift) & 0xFF:02x}" for shift in range(40, -1, -8))
+
+
+def _wav_header(metadata: SpeechMetadata, data_size: int) -> bytes:
+    """Return a 44-byte PCM RIFF/WAVE header for the given stream metadata."""
+    sample_width = metadata.bit_rate // 8
+    block_align = metadata.channel * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + data_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,
+        metadata.channel,
+        metadata.sample_rate,
+        metadata.sample_rate * block_align,
+        block_align,
+        metadata.bit_rate,
+        b"data",
+        data_size,
+    )
+
+
 async def async_get_engine(hass, config, discovery_info=None):
     """Set up Azure STT component."""
     api_key = config.get(CONF_API_KEY)
@@ -58,6 +99,15 @@ class RsTunedSTTProvider(Provider):
         self.name = "RS-Tuned STT"
         self.hass = hass
         self.api_key = api_key
+        self._session: aiohttp.ClientSession | None = None
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, self._async_close_session)
+        # HA 공용 executor 를 막지 않도록 오디오 처리는 전용 스레드에서 실행
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="stt_audio"
+        )
+        hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_CLOSE, self._async_shutdown_executor
+        )
 
     @property
     def supported_languages(self) -> list[str]:
@@ -89,21 +139,32 @@ class RsTunedSTTProvider(Provider):
         """Return a list of supported channels."""
         return [AudioChannels.CHANNEL_MONO]
 
-    async def convert_wav_to_mp3(self, wav_data: bytes) -> bytes:
-        """Convert WAV audio data to MP3 format."""
-        try:
-            audio = AudioSegment.from_wav(io.BytesIO(wav_data))
-            mp3_buffer = io.BytesIO()
-            audio.export(mp3_buffer, format="mp3", codec="libmp3lame")
-            return mp3_buffer.getvalue()
-        except Exception as e:
-            _LOGGER.error(f"Error converting WAV to MP3: {str(e)}")
-            raise
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=10),
+                connector=aiohttp.TCPConnector(limit=4, ttl_dns_cache=300),
+            )
+        return self._session
+
+    async def _async_close_session(self, event=None) -> None:
+        """Close the shared HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _async_shutdown_executor(self, event=None) -> None:
+        """Shut down the audio processing executor."""
+        self._executor.shutdown(wait=False)
 
     def is_detect_voice(
-        self, audio_segment, thresh=-50, min_silence_len=500, silence_thresh=-70
+        self, audio_segment, thresh=-50, window_len=100, seek_step=10
     ):
-        """Detects non-silent parts of the audio and returns True if silence is predominant."""
+        """Return True if any window_len ms window is louder than thresh dBFS.
+
+        Sounds shorter than window_len are averaged over the whole window.
+        """
         if not isinstance(audio_segment, AudioSegment):
             _LOGGER.error(
                 "Expected an instance of AudioSegment, got type of {}".format(
@@ -111,41 +172,62 @@ class RsTunedSTTProvider(Provider):
                 )
             )
 
-        # 비침묵 구간 검출
-        nonsilent_ranges = detect_nonsilent(
-            audio_segment,
-            min_silence_len=min_silence_len,
-            silence_thresh=silence_thresh,
-        )
-
-        _LOGGER.debug(nonsilent_ranges)
-
-        # 감지된 무음이 아닌 구간 중 임계값 이상의 소리가 있는지 검사
-        for start_i, end_i in nonsilent_ranges:
-            segment = audio_segment[start_i:end_i]
-            if segment.dBFS > thresh:
-                return True
-
-        return False
-
-    async def async_send_audio_data(self, file_path, text):
+        # dBFS 변환(log) 대신 제곱 에너지로 비교하도록 임계값을 미리 계산
+        amp_thresh = audio_segment.max_possible_amplitude * 10 ** (thresh / 20)
+        amp_thresh_sq = amp_thresh * amp_thresh
+
+        samples = np.frombuffer(
+            audio_segment.raw_data, dtype=f"<i{audio_segment.sample_width}"
+        ).astype(np.float64)
+        if samples.size == 0:
+            return False
+
+        # 구간별 RMS 를 누적합으로 한 번에 계산 (구간 길이는 프레임 * 채널 수 샘플)
+        channels = audio_segment.channels
+        window = max(1, int(window_len * audio_segment.frame_rate / 1000)) * channels
+        window = min(window, samples.size)
+        step = max(1, int(seek_step * audio_segment.frame_rate / 1000)) * channels
+        csum = np.concatenate(([0.0], np.cumsum(samples * samples)))
+        starts = np.arange(0, samples.size - window + 1, step)
+        # 마지막 구간이 끝까지 덮지 못하면 남은 샘플을 끝에 맞춘 구간으로 포함
+        if starts[-1] + window < samples.size:
+            starts = np.append(starts, samples.size - window)
+        rms2 = (csum[starts + window] - csum[starts]) / window
+
+        _LOGGER.debug(f"$$$ window count : {rms2.size}")
+
+        # 임계값 이상의 소리가 있는 구간이 있는지 검사
+        return bool(np.any(rms2 > amp_thresh_sq))
+
+    async def async_send_audio_data(self, audio_bytes: bytes, filename, text):
         url = "https://rs-audio-router.azurewebsites.net/api/v1/audio-routing"
-        mac_address = netifaces.ifaddresses("end0")[netifaces.AF_LINK][0]["addr"]
-        timestamp = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
+        mac_address = _get_mac()
+        timestamp = int(time.time())
         headers = {"x-functions-key": self.api_key}
-        data = {"text": text, "timestamp": str(timestamp), "macAddress": mac_address}
-        _LOGGER.debug(f"$$$ filename : {file_path},  datas: {data}")
+        _LOGGER.debug(
+            f"$$$ filename : {filename},  text: {text}, macAddress: {mac_address}"
+        )
 
-        def job():
-            with open(file_path, "rb") as file:
-                files = {"audio": file}
-                response = requests.post(url, headers=headers, files=files, data=data)
-                response.raise_for_status()
-                return response.json()
+        session = await self._get_session()
 
         try:
-            async with async_timeout.timeout(10):
-                response = await self.hass.async_add_executor_job(job)
+            form = aiohttp.FormData()
+            form.add_field("text", text)
+            form.add_field("timestamp", str(timestamp))
+            form.add_field("macAddress", mac_address)
+            form.add_field(
+                "audio",
+                audio_bytes,
+                filename=filename,
+                content_type="audio/wav",
+            )
+            async with session.post(
+                url,
+                headers=headers,
+                data=form,
+            ) as resp:
+                resp.raise_for_status()
+                response = await resp.json()
                 _LOGGER.debug(f"$$$ Response : {response}")
                 return response
         except Exception as e:
@@ -156,45 +238,66 @@ class RsTunedSTTProvider(Provider):
     async def async_process_audio_stream(
         self, metadata: SpeechMetadata, stream: AsyncIterable[bytes]
     ) -> SpeechResult:
-        audio_data = b""
+        sample_width = metadata.bit_rate // 8
+        dtype = np.dtype(f"<i{sample_width}")
+        chunks = []
+        leftover = b""
+        sum_sq = 0.0
+        n_samples = 0
         async for chunk in stream:
-            audio_data += chunk
+            chunks.append(chunk)
+            # 청크가 샘플 경계에서 끊기지 않을 수 있으므로 남는 바이트는 다음 청크로 넘김
+            buf = leftover + chunk
+            usable = len(buf) - len(buf) % sample_width
+            leftover = buf[usable:]
+            samples = np.frombuffer(
+                buf, dtype=dtype, count=usable // sample_width
+            ).astype(np.float64)
+            sum_sq += float(np.dot(samples, samples))
+            n_samples += samples.size
+        audio_data = b"".join(chunks)
+        # 마지막의 불완전한 프레임은 버림
+        frame_width = sample_width * metadata.channel
+        audio_data = audio_data[: len(audio_data) - len(audio_data) % frame_width]
 
         _LOGGER.debug(f"$$$ voice data size : {len(audio_data)}")
         if len(audio_data) <= 1000:
             _LOGGER.debug("No audio data received.")
             return SpeechResult("", SpeechResultState.ERROR)
 
-        # Create an audio stream that complies with the API requirements
-        wav_stream = io.BytesIO()
-        with wave.open(wav_stream, "wb") as wf:
-            wf.setnchannels(metadata.channel)
-            wf.setsampwidth(metadata.bit_rate // 8)
-            wf.setframerate(metadata.sample_rate)
-            wf.writeframes(audio_data)
+        full_scale = float(1 << (8 * sample_width - 1))
+        rms_db = 10 * math.log10(max(sum_sq / n_samples, 1) / full_scale**2)
+        _LOGGER.debug(f"$$$ voice level : {rms_db:.1f} dBFS")
+        if rms_db < SILENCE_THRESH:
+            _LOGGER.debug("Audio is below the silence threshold.")
+            return SpeechResult("", SpeechResultState.ERROR)
 
-        current_time = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        mp3_path = f"/config/stt/stt_{current_time}.mp3"
+        filename = f"stt_{time.time_ns()}.wav"
 
         def job():
-            # Convert WAV to MP3
-            wav_stream.seek(0)  # 스트림의 위치를 처음으로 되돌림
-            sound = AudioSegment.from_file(wav_stream, format="wav")
+            # PCM 데이터로 바로 AudioSegment 생성
+            sound = AudioSegment(
+                data=audio_data,
+                sample_width=metadata.bit_rate // 8,
+                frame_rate=metadata.sample_rate,
+                channels=metadata.channel,
+            )
 
             is_voice = self.is_detect_voice(sound)
             _LOGGER.debug(f"$$$ is voice detect : {is_voice}")
             if not is_voice:
-                return SpeechResult("", SpeechResultState.ERROR)
+                return None
 
-            sound.export(mp3_path, format="mp3")
-            return mp3_path
+            # MP3 인코딩 없이 WAV 그대로 전송
+            return _wav_header(metadata, len(audio_data)) + audio_data
 
         async with async_timeout.timeout(10):
-            response = await self.hass.async_add_executor_job(job)
-            if response:
-                # await self.async_send_audio_data(mp3_path, response.text)
+            wav_bytes = await asyncio.get_running_loop().run_in_executor(
+                self._executor, job
+            )
+            if wav_bytes:
                 self.hass.create_task(
-                    self.async_send_audio_data(mp3_path, "transcribed text")
+                    self.async_send_audio_data(wav_bytes, filename, "transcribed text")
                 )
                 return SpeechResult(
                     "transcribed text",